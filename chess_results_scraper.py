@@ -1,137 +1,258 @@
 import os
 import asyncio
-import aiohttp
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import shutil
+import httpx
 import pandas as pd
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+
+# Row classes that mark (repeated) header rows in results tables
+_HEADER_ROW_CLASSES = frozenset({"CRng1b", "CRg1b"})
+
+
+def _get_column_structure(tree: LexborHTMLParser):
+    """
+    Extract column structure from the results table header.
+    Try 'CRng1b' first, then 'CRg1b' as fallback.
+    Returns a dict mapping {col_name -> col_index}.
+    """
+    header_row = tree.css_first("table.CRs1 tr.CRng1b")
+    if not header_row:
+        header_row = tree.css_first("table.CRs1 tr.CRg1b")
+
+    if not header_row:
+        return {}
+
+    columns = {}
+    header_cells = header_row.css("th, td")
+    for i, col in enumerate(header_cells):
+        col_name = col.text(strip=True)
+        if not col_name:  # If blank or &nbsp;
+            col_name = f"col_{i}"
+        columns[col_name] = i
+
+    return columns
+
+
+def _parse_results_html(html, relative_url):
+    """
+    Parse a full results page (str or bytes) into a dict of per-column
+    value lists.
+
+    Top-level function (not a method) so it stays picklable and can run
+    in a ProcessPoolExecutor worker. Column-oriented output lets pandas
+    build each column as one array instead of inferring dtypes row by row.
+    """
+    tree = LexborHTMLParser(html)
+
+    # 1) Get column structure
+    col_map = _get_column_structure(tree)
+    if not col_map:
+        print(f"No header row found for {relative_url}")
+        return {}
+
+    # 2) Parse each data row
+    table = tree.css_first("table.CRs1")
+    if not table:
+        print(f"No 'CRs1' table found for {relative_url}")
+        return {}
+
+    # Resolve the column map once to (name, idx) tuples ordered by index;
+    # the row loop then does plain list indexing with no per-row dict walk.
+    ordered_cols = sorted(col_map.items(), key=lambda item: item[1])
+
+    columns = {name: [] for name in col_map}
+    columns["tournament_url"] = []
+
+    for tr in table.css("tr"):
+        # Skip header rows before enumerating any cells; results pages
+        # repeat the header, so this fires often.
+        row_classes = tr.attributes.get("class")
+        if row_classes and not _HEADER_ROW_CLASSES.isdisjoint(row_classes.split()):
+            continue
+
+        cells = tr.css("td")
+        if len(cells) < 2:
+            continue
+
+        # Extract every cell's text in one pass; the column map then indexes
+        # into plain strings instead of re-traversing cell subtrees.
+        texts = [cell.text(strip=True) for cell in cells]
+        row_vals = [
+            texts[idx] if idx < len(texts) else None
+            for _, idx in ordered_cols
+        ]
+
+        # If the row is not completely empty, append it column-wise
+        if any(row_vals):
+            for (col_name, _), value in zip(ordered_cols, row_vals):
+                columns[col_name].append(value)
+            columns["tournament_url"].append(relative_url)
+
+    return columns
 
 
 class ChessResultsScraper:
-    def __init__(self, data_path="data", base_url="https://chess-results.com/", max_concurrency=20):
+    def __init__(self, data_path="data", base_url="https://chess-results.com/", max_concurrency=100):
         """
         :param data_path: Path to the 'data' folder, which contains 'start_lists' and 'results' subfolders.
         :param base_url: Base URL for chess-results.com
-        :param max_concurrency: Maximum number of concurrent requests.
+        :param max_concurrency: Maximum number of concurrent requests. Must match
+            the httpx max_connections limit — exceeding it makes requests queue
+            inside the client and thrash the pool.
         """
         self.data_path = data_path
         self.base_url = base_url
         self.max_concurrency = max_concurrency
-
-    def get_column_structure(self, soup: BeautifulSoup):
-        """
-        Extract column structure from the results table header.
-        Try 'CRng1b' first, then 'CRg1b' as fallback.
-        Returns a dict mapping {col_name -> col_index}.
-        """
-        header_row = soup.select_one("table.CRs1 tr.CRng1b")
-        if not header_row:
-            header_row = soup.select_one("table.CRs1 tr.CRg1b")
-
-        if not header_row:
-            return {}
-
-        columns = {}
-        header_cells = header_row.find_all(["th", "td"])
-        for i, col in enumerate(header_cells):
-            col_name = col.get_text(strip=True)
-            if not col_name:  # If blank or &nbsp;
-                col_name = f"col_{i}"
-            columns[col_name] = i
-
-        return columns
-
-    def parse_result_row(self, row, column_map):
-        """
-        Parse a single <tr> of data based on the column_map.
-        Returns a dict with {column_name: cell_text}.
-        """
-        cells = row.find_all("td")
-        row_data = {}
-        for col_name, idx in column_map.items():
-            if idx < len(cells):
-                cell_text = cells[idx].get_text(strip=True)
-                row_data[col_name] = cell_text
-            else:
-                row_data[col_name] = None
-        return row_data
-
-    async def fetch_tournament_results(self, session, relative_url):
+        self.cache_path = os.path.join(data_path, "cache")
+        # Parsing is CPU-bound; run it in worker processes so the asyncio
+        # loop stays free to keep the network saturated.
+        self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
+
+    def _cache_paths(self, relative_url):
+        """Return (body_path, meta_path) for a tournament URL's cache entry."""
+        key = hashlib.sha1(relative_url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_path, key)
+        return f"{base}.html.gz", f"{base}.json"
+
+    async def fetch_tournament_results(self, client, relative_url):
         """
         Asynchronously fetch a single tournament's results page and parse it into a DataFrame.
+        Fetching happens on the event loop; parsing is offloaded to the process pool.
         """
         url = f"{self.base_url}{relative_url}&art=5&zeilen=99999"
 
         try:
-            async with session.get(url) as response:
-                html = await response.text()
-
-            soup = BeautifulSoup(html, "lxml")
-
-            # 1) Get column structure
-            col_map = self.get_column_structure(soup)
-            if not col_map:
-                print(f"No header row found at {url}")
-                return pd.DataFrame()
-
-            # 2) Parse each data row
-            table = soup.select_one("table.CRs1")
-            if not table:
-                print(f"No 'CRs1' table found at {url}")
-                return pd.DataFrame()
-
-            rows = []
-            for tr in table.find_all("tr"):
-                row_classes = tr.get("class", [])
-                # Skip header rows
-                if "CRng1b" in row_classes or "CRg1b" in row_classes:
-                    continue
-
-                tds = tr.find_all("td")
-                if len(tds) < 2:
-                    continue
-
-                # Parse row
-                row_data = self.parse_result_row(tr, col_map)
-                row_data["tournament_url"] = relative_url
-
-                # If row_data is not completely empty, add to list
-                if any(v for v in row_data.values()):
-                    rows.append(row_data)
-
-            return pd.DataFrame(rows)
+            # Conditional GET against the on-disk cache: on 304 we reuse the
+            # cached bytes instead of re-downloading the page.
+            body_path, meta_path = self._cache_paths(relative_url)
+            headers = {}
+            if os.path.exists(meta_path) and os.path.exists(body_path):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+
+            response = await client.get(url, headers=headers)
+
+            if response.status_code == 304:
+                with gzip.open(body_path, "rb") as f:
+                    body = f.read()
+            else:
+                # Hand the raw bytes to the parser; decoding to str here would
+                # just add a charset pass the parser doesn't need.
+                body = response.content
+                os.makedirs(self.cache_path, exist_ok=True)
+                with gzip.open(body_path, "wb") as f:
+                    f.write(body)
+                with open(meta_path, "w") as f:
+                    json.dump({
+                        "url": relative_url,
+                        "etag": response.headers.get("etag"),
+                        "last_modified": response.headers.get("last-modified"),
+                    }, f)
+
+            loop = asyncio.get_running_loop()
+            columns = await loop.run_in_executor(self._pool, _parse_results_html, body, relative_url)
+            return pd.DataFrame(columns)
 
         except Exception as e:
             print(f"Error fetching/parsing {url}: {e}")
             return pd.DataFrame()
 
-    async def process_tournaments_async(self, tournament_urls, max_concurrency=None):
+    def _make_client(self):
+        """
+        Build the shared httpx client. HTTP/2 multiplexes requests over a few
+        keepalive connections, so we avoid a TCP+TLS handshake per page.
         """
-        Asynchronously fetch and parse multiple tournament URLs in parallel.
-        Returns a single DataFrame containing all rows from all tournaments.
+        return httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+            timeout=30,
+            headers={"Accept-Encoding": "gzip, deflate"},
+            # httpx doesn't follow redirects by default (aiohttp did);
+            # without this a redirected page yields the 3xx body.
+            follow_redirects=True,
+        )
+
+    async def process_tournaments_async(self, client, tournament_urls, output_path, max_concurrency=None):
+        """
+        Asynchronously fetch and parse multiple tournament URLs in parallel,
+        spilling each tournament's rows to a typed piece file as soon as
+        they are parsed. This keeps peak memory at roughly one tournament
+        instead of a whole country. Once every tournament has landed, the
+        pieces are assembled into `output_path` against the union of all
+        their columns and moved into place atomically, so an interrupted
+        run leaves no output file and the skip check never mistakes a
+        partial country for a finished one.
+        Returns the number of rows written.
         """
         if max_concurrency is None:
             max_concurrency = self.max_concurrency
 
         semaphore = asyncio.Semaphore(max_concurrency)
-        all_frames = []
-
-        async with aiohttp.ClientSession() as session:
-            async def fetch_with_limit(url):
-                async with semaphore:
-                    return await self.fetch_tournament_results(session, url)
+        total_rows = 0
+
+        # Tournaments complete in arbitrary order and with varying schemas
+        # (round counts differ per event), so no single tournament may
+        # define the column layout: a running first-seen union of columns
+        # is kept while the pieces are written, and every piece is
+        # reindexed against that union during assembly. Reindexing against
+        # the first finisher would silently drop the extra round columns
+        # of longer events.
+        pieces_dir = f"{output_path}.pieces"
+        os.makedirs(pieces_dir, exist_ok=True)
+        piece_paths = []
+        header_columns = []
+        seen_columns = set()
+
+        async def fetch_with_limit(url):
+            async with semaphore:
+                return await self.fetch_tournament_results(client, url)
+
+        tasks = [asyncio.create_task(fetch_with_limit(u)) for u in tournament_urls]
+        try:
+            for task in asyncio.as_completed(tasks):
+                try:
+                    df = await task
+                except Exception as e:
+                    print(f"Got an exception: {e}")
+                    continue
 
-            tasks = [asyncio.create_task(fetch_with_limit(u)) for u in tournament_urls]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+                if df.empty:
+                    continue
 
-        for res in results:
-            if isinstance(res, pd.DataFrame):
-                all_frames.append(res)
+                for col in df.columns:
+                    if col not in seen_columns:
+                        seen_columns.add(col)
+                        header_columns.append(col)
+
+                piece_path = os.path.join(pieces_dir, f"{len(piece_paths)}.parquet")
+                df.to_parquet(piece_path, compression="zstd", index=False)
+                piece_paths.append(piece_path)
+                total_rows += len(df)
+
+            # Assemble the final CSV piece by piece (peak memory stays at
+            # one tournament), then publish it with an atomic rename.
+            # A zero-row country still gets an empty file, so it isn't
+            # re-scraped on every run.
+            tmp_path = f"{output_path}.tmp"
+            if piece_paths:
+                for i, piece_path in enumerate(piece_paths):
+                    piece = pd.read_parquet(piece_path).reindex(columns=header_columns)
+                    piece.to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
             else:
-                print(f"Got an exception: {res}")
+                pd.DataFrame().to_csv(tmp_path, index=False)
+            os.replace(tmp_path, output_path)
+        finally:
+            shutil.rmtree(pieces_dir, ignore_errors=True)
 
-        if all_frames:
-            return pd.concat(all_frames, ignore_index=True)
-        else:
-            return pd.DataFrame()
+        return total_rows
 
     async def run_main(self):
         """
@@ -143,29 +264,51 @@ class ChessResultsScraper:
         start_lists_path = os.path.join(self.data_path, "start_lists")
         results_path = os.path.join(self.data_path, "results")
 
-        start_lists = os.listdir(start_lists_path)
-        # Get first part of the file name before _
-        countries = [s.split("_")[0] for s in start_lists]
-        sorted_countries = sorted(countries)
-
-        for country in sorted_countries:
-            output_file = os.path.join(results_path, f"{country}_results.csv")
-            if os.path.exists(output_file):
-                print(f"Skipping {country}")
-                continue
-
-            print(f"Processing {country}")
-            start_list_file = os.path.join(start_lists_path, f"{country}_start_list.csv")
-            start_list = pd.read_csv(start_list_file)
+        try:
+            # One directory scan each instead of a stat syscall per country:
+            # country codes come from the start-list file names, and already
+            # scraped countries are looked up in a precomputed name set.
+            sorted_countries = sorted(
+                {entry.name.split("_", 1)[0] for entry in os.scandir(start_lists_path)}
+            )
+            existing_results = (
+                {entry.name for entry in os.scandir(results_path)}
+                if os.path.isdir(results_path) else set()
+            )
+
+            # One client for the whole run: the connection pool (and its DNS
+            # and TLS warmup) is reused across countries instead of being
+            # rebuilt ~250 times.
+            async with self._make_client() as client:
+                for country in sorted_countries:
+                    output_file = os.path.join(results_path, f"{country}_results.csv")
+                    if f"{country}_results.csv" in existing_results:
+                        print(f"Skipping {country}")
+                        continue
+
+                    print(f"Processing {country}")
+                    # Start lists are written as Parquet; fall back to CSV for
+                    # data scraped before the format switch.
+                    start_list_file = os.path.join(start_lists_path, f"{country}_start_list.parquet")
+                    if os.path.exists(start_list_file):
+                        start_list = pd.read_parquet(start_list_file)
+                    else:
+                        start_list = pd.read_csv(os.path.join(start_lists_path, f"{country}_start_list.csv"))
+
+                    # Get unique URLs from the start list
+                    tournament_urls = start_list['tournament_url'].unique()
+
+                    # Process tournaments, streaming rows to the output CSV
+                    total_rows = await self.process_tournaments_async(client, tournament_urls, output_file)
+                    print(f"Saved {total_rows} rows for {country}")
+        finally:
+            self._pool.shutdown()
 
-            # Get unique URLs from the start list
-            tournament_urls = start_list['tournament_url'].unique()
+        print("All done!")
 
-            # Process tournaments
-            combined_df = await self.process_tournaments_async(tournament_urls)
 
-            # Save to CSV
-            combined_df.to_csv(output_file, index=False)
-            print(f"Saved {len(combined_df)} rows for {country}")
+if __name__ == "__main__":
+    import uvloop
 
-        print("All done!")
+    uvloop.install()
+    asyncio.run(ChessResultsScraper().run_main())
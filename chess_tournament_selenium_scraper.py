@@ -1,12 +1,9 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+import asyncio
+import glob
+import httpx
+from selectolax.lexbor import LexborHTMLParser
 import pandas as pd
 from datetime import datetime, timedelta
-import time
 import os
 
 
@@ -17,19 +14,24 @@ class ChessTournamentSeleniumScraper:
         output_file="chess_tournaments_selenium.csv",
         start_years=20,  # How many years to go back from today, to make sure we don't miss any tournaments
         countries_alpha3=None,
-        headless=True
+        countries_path=os.path.join("data", "countries"),
+        max_concurrency=10
     ):
         """
         :param base_url: The page on chess-results.com to search for tournaments.
         :param output_file: Where to append or save the results of the scraping.
         :param start_years: How many years in the past to start searching.
         :param countries_alpha3: List of country codes to scrape. If None, a default list is used.
-        :param headless: Whether to run Chrome in headless mode.
+        :param countries_path: Directory for the per-country checkpoint CSVs.
+        :param max_concurrency: How many countries to scrape concurrently.
         """
         self.base_url = base_url
         self.output_file = output_file
         self.start_years = start_years
-        self.countries_alpha3 = countries_alpha3 or [
+        self.countries_path = countries_path
+        self.max_concurrency = max_concurrency
+        # Immutable so concurrent per-country tasks can safely share it
+        self.countries_alpha3 = tuple(countries_alpha3) if countries_alpha3 else (
             "AFG", "ALA", "ALB", "ALG", "ASM", "AND", "ANG", "ANT", "ARG", "ARM", "ARU", "ACF", "AUS",
             "AUT", "AZE", "BAH", "BRN", "BAN", "BAR", "BLR", "BEL", "BIZ", "BEN", "BER", "BHU", "BOL",
             "BES", "BIH", "BOT", "BRA", "IOT", "IVB", "BRU", "BUL", "BUR", "BDI", "CAM", "CMR", "CAN",
@@ -50,30 +52,47 @@ class ChessTournamentSeleniumScraper:
             "TJK", "TAN", "THA", "TLS", "TOG", "TKL", "TON", "TTO", "TUN", "TUR", "TKM", "TCA", "TUV",
             "UGA", "UKR", "UAE", "USA", "XXX", "YYY", "ZZZ", "---", "URU", "ISV", "UZB", "VAN", "VUT",
             "VEN", "VIE", "WLS", "WLF", "WFC", "YEM", "SCG", "ZAM", "ZIM"
-        ]
-        self.driver = None
-        self.headless = headless
+        )
+        self._client = None
 
-    def setup_driver(self):
+    def setup_client(self):
         """
-        Sets up the Selenium Chrome driver with professional configuration.
+        Sets up the shared httpx client with a browser-like User-Agent.
         """
-        chrome_options = Options()
-        
-        # Professional User-Agent
-        chrome_options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-        
-        if self.headless:
-            chrome_options.add_argument("--headless=new")
-        
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--window-size=1920,1080")
-        
-        
-        self.driver = webdriver.Chrome(options=chrome_options)
-        
-
+        self._client = httpx.AsyncClient(
+            headers={
+                "User-Agent": (
+                    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+                )
+            },
+            timeout=30,
+            follow_redirects=True,
+        )
+        # Pre-set the Cookiebot consent cookie once so no request ever gets
+        # the consent interstitial (the Selenium version clicked the dialog
+        # on every first country visit).
+        self._client.cookies.set("CookieConsent", "true", domain="chess-results.com")
+
+    def _get_form_state(self, html):
+        """
+        Scrape the hidden ASP.NET WebForms fields (__VIEWSTATE,
+        __VIEWSTATEGENERATOR, __EVENTVALIDATION, ...) plus the search button
+        value, all of which must be echoed back in the form POST.
+        """
+        tree = LexborHTMLParser(html)
+        fields = {}
+        for inp in tree.css("input[type=hidden]"):
+            name = inp.attributes.get("name")
+            if name:
+                fields[name] = inp.attributes.get("value") or ""
+
+        button = tree.css_first("input[name='P1$cb_suchen']")
+        if button is not None:
+            fields["P1$cb_suchen"] = button.attributes.get("value") or "Search"
+        return fields
+
+    @staticmethod
     def convert_date_format(date_str):
         """
         Convert YYYY/MM/DD to DD.MM.YYYY format.
@@ -81,7 +100,7 @@ class ChessTournamentSeleniumScraper:
         date_obj = datetime.strptime(date_str, '%Y/%m/%d')
         return date_obj.strftime("%d.%m.%Y")
 
-    
+    @staticmethod
     def is_bogus_date(date_str):
         """
         Returns True if date_str is not a valid date in YYYY/MM/DD; else False.
@@ -92,7 +111,7 @@ class ChessTournamentSeleniumScraper:
         except ValueError:
             return True
 
-    
+    @staticmethod
     def time_delta_between_dates(date1, date2):
         """
         Returns the difference in days between two dates in DD.MM.YYYY format.
@@ -101,30 +120,30 @@ class ChessTournamentSeleniumScraper:
         d2 = datetime.strptime(date2, "%d.%m.%Y")
         return (d2 - d1).days
 
-    
     def parse_tournaments(self, html):
         """
         Parse the HTML page_source for tournament data and return a list of dicts.
         """
-        soup = BeautifulSoup(html, "html.parser")
+        tree = LexborHTMLParser(html)
         tournaments = []
 
-        # The table with class 'CRs2' has results; skip header row.
-        rows = soup.select("table.CRs2 tr:has(td)")[1:]
+        # The table with class 'CRs2' has results; keep rows that carry data
+        # cells and skip the first of them (the header row).
+        rows = [tr for tr in tree.css("table.CRs2 tr") if tr.css_first("td")][1:]
         for row in rows:
-            cols = row.find_all("td")
+            cols = row.css("td")
             if len(cols) >= 6:
                 # columns: 0=No, 1=Name, 2=Country, 3=?, 4=?, 5=StartDate, 6=EndDate
+                link = cols[1].css_first('a')
                 tournaments.append({
-                    "end_date": cols[6].text.strip(),
-                    "start_date": cols[5].text.strip(),
-                    "country": cols[2].text.strip(),
-                    "name": cols[1].text.strip(),
-                    "url": cols[1].find('a')['href'] if cols[1].find('a') else None
+                    "end_date": cols[6].text(strip=True),
+                    "start_date": cols[5].text(strip=True),
+                    "country": cols[2].text(strip=True),
+                    "name": cols[1].text(strip=True),
+                    "url": link.attributes.get('href') if link else None
                 })
         return tournaments
 
-    
     def create_checkpoint(self, output_file, all_tournaments, country):
         """
         Write tournaments to CSV, appending if file exists. Clears all_tournaments afterwards.
@@ -143,136 +162,136 @@ class ChessTournamentSeleniumScraper:
             # Clear list to free memory
             all_tournaments.clear()
 
-    
+    @staticmethod
     def find_last_valid_date(response):
         """
-        Find the last valid end_date (YYYY/MM/DD) in a list of tournament dictionaries.
+        Find the last valid end_date (YYYY/MM/DD) in a list of tournament
+        dictionaries. Parses the whole column in one vectorized pass instead
+        of calling strptime row by row; invalid dates coerce to NaT and are
+        dropped. Returns a Timestamp or None.
         """
-        for i in range(1, len(response) + 1):
-            last_date = response[-i]["end_date"]
-            if not ChessTournamentSeleniumScraper.is_bogus_date(last_date):
-                return last_date
-        return None
-
-    def fetch_tournaments(self, start_date, end_date, country):
+        if not response:
+            return None
+        end_dates = pd.to_datetime(
+            pd.Series([t["end_date"] for t in response]),
+            format="%Y/%m/%d",
+            errors="coerce",
+        ).dropna()
+        if end_dates.empty:
+            return None
+        return end_dates.iloc[-1]
+
+    async def fetch_tournaments(self, start_date, end_date, country):
         """
-        Given a start_date, end_date, and a country code, fills the form on the site
-        and returns the parsed tournament data.
+        Given a start_date, end_date, and a country code, replays the search
+        form submission as a direct HTTP POST (WebForms __VIEWSTATE handshake
+        included) and returns the parsed tournament data. No browser involved.
         """
-        driver = self.driver
         try:
-            driver.get(self.base_url)
-
-            # Accept cookies for the first run with the first country in the list (optional)
-            if country == self.countries_alpha3[0]:
-                WebDriverWait(driver, 2).until(
-                    EC.presence_of_element_located(
-                        (By.ID, "CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll")
-                    )
-                )
-                driver.find_element(
-                    By.ID, "CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll"
-                ).click()
-
-            # Wait for search button (P1_cb_suchen) to appear
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "P1_cb_suchen"))
-            )
-
-            # Date inputs
-            start_date_field = driver.find_element(By.ID, "P1_txt_von_tag")
-            end_date_field = driver.find_element(By.ID, "P1_txt_bis_tag")
-            start_date_field.clear()
-            end_date_field.clear()
-            start_date_field.send_keys(start_date)
-            end_date_field.send_keys(end_date)
-
-            # Only finished tournaments
-            driver.find_element(By.ID, "P1_cbox_zuEnde").click()
-
-            # Results per page
-            results_dropdown = Select(driver.find_element(By.ID, "P1_combo_anzahl_zeilen"))
-            results_dropdown.select_by_visible_text("2000")
-
-            # Country filter
-            country_dropdown = Select(driver.find_element(By.ID, "P1_combo_land"))
-            country_dropdown.select_by_value(country)
-
-            # Sort by "Start date descending" (value=4)
-            sort_dropdown = Select(driver.find_element(By.ID, "P1_combo_sort"))
-            sort_dropdown.select_by_value("4")
-
-            # Submit form
-            search_button = driver.find_element(By.ID, "P1_cb_suchen")
-            search_button.click()
-
-            # Wait for results to load
-            WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located((By.ID, "P1_cb_suchen"))
-            )
-
-            time.sleep(1)  # Extra buffer
-            return self.parse_tournaments(driver.page_source)
+            # Initial GET to pick up the hidden WebForms state for this POST
+            response = await self._client.get(self.base_url)
+            form = self._get_form_state(response.text)
+
+            form.update({
+                "P1$txt_von_tag": start_date,
+                "P1$txt_bis_tag": end_date,
+                # Only finished tournaments
+                "P1$cbox_zuEnde": "on",
+                # Results per page
+                "P1$combo_anzahl_zeilen": "2000",
+                # Country filter
+                "P1$combo_land": country,
+                # Sort by "Start date descending" (value=4)
+                "P1$combo_sort": "4",
+            })
+
+            response = await self._client.post(self.base_url, data=form)
+            return self.parse_tournaments(response.text)
 
         except Exception as e:
             print(f"Error fetching {country}-{end_date}: {str(e)}")
             return []
 
-    def fetch_data(self, start_date, end_date, country):
+    async def fetch_data(self, start_date, end_date, country):
         """
         Simple wrapper for fetch_tournaments, if you need extra logic in the future.
         """
-        return self.fetch_tournaments(start_date, end_date, country)
+        return await self.fetch_tournaments(start_date, end_date, country)
 
-    def crawl_all_tournaments(self):
+    async def _scrape_country(self, country, semaphore):
+        """
+        Scrape one country end-to-end, walking the date range backwards until
+        fewer than 2000 results come back. Writes checkpoints to this
+        country's own CSV so concurrent tasks never touch the same file.
+        """
+        country_file = os.path.join(self.countries_path, f"{country}_tournaments.csv")
+        if os.path.exists(country_file):
+            print(f"Skipping {country}")
+            return
+
+        async with semaphore:
+            print(f"Processing country: {country}")
+            # Start from 'today' and go back self.start_years years
+            current_end_date = datetime.now().strftime("%d.%m.%Y")
+            start_date = (datetime.now() - timedelta(days=self.start_years * 365))
+            current_start_date = start_date.strftime("%d.%m.%Y")
+
+            country_tournaments = []
+
+            while True:
+                response = await self.fetch_data(current_start_date, current_end_date, country)
+                country_tournaments.extend(response)
+
+                # If fewer than 2000 results are returned, we've exhausted the range
+                if len(response) < 2000:
+                    self.create_checkpoint(country_file, country_tournaments, country)
+                    break  # Done with this country
+
+                # If 2000 results, we likely have more to fetch. Update date range.
+                last_date = self.find_last_valid_date(response)
+                if not last_date:
+                    # No valid date found, break to avoid infinite loop
+                    break
+
+                # Move end_date backward by one day from the last valid date
+                last_date_dt = last_date - timedelta(days=1)
+                current_end_date = last_date_dt.strftime("%d.%m.%Y")
+
+                # Save partial results
+                self.create_checkpoint(country_file, country_tournaments, country)
+
+    async def crawl_all_tournaments(self):
         """
         Main method that controls the multi-year, multi-country scraping logic.
-        Iterates over countries_alpha3, going back self.start_years from today,
-        collecting tournament data until fewer than 2000 results appear.
+        Countries are independent, so they are scraped concurrently under a
+        semaphore; each writes its own checkpoint CSV, and a final merge pass
+        concatenates them into self.output_file.
         """
-        self.setup_driver()
-        all_tournaments = []
+        os.makedirs(self.countries_path, exist_ok=True)
+        self.setup_client()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
 
         try:
-            for country in self.countries_alpha3:
-                print(f"Processing country: {country}")
-                # Start from 'today' and go back self.start_years years
-                end_date = datetime.now().strftime("%d.%m.%Y")
-                current_end_date = end_date
-                start_date = (datetime.now() - timedelta(days=self.start_years * 365))
-                current_start_date = start_date.strftime("%d.%m.%Y")
-
-                country_tournaments = []
-
-                while True:
-                    response = self.fetch_data(current_start_date, current_end_date, country)
-                    country_tournaments.extend(response)
-                    all_tournaments.extend(response)
-
-                    # If fewer than 2000 results are returned, we've exhausted the range
-                    if len(response) < 2000:
-                        self.create_checkpoint(self.output_file, country_tournaments, country)
-                        break  # Move on to next country
-
-                    # If 2000 results, we likely have more to fetch. Update date range.
-                    last_date = self.find_last_valid_date(response)
-                    if not last_date:
-                        # No valid date found, break to avoid infinite loop
-                        break
-
-                    # Move end_date backward by one day from the last valid date
-                    # Note: last_date is in YYYY/MM/DD; we convert to a datetime,
-                    # then shift one day
-                    last_date_dt = datetime.strptime(last_date, "%Y/%m/%d")
-                    last_date_dt = last_date_dt - timedelta(days=1)
-                    current_end_date = last_date_dt.strftime("%d.%m.%Y")
-
-                    # Save partial results
-                    self.create_checkpoint(self.output_file, country_tournaments, country)
-
+            results = await asyncio.gather(
+                *(self._scrape_country(country, semaphore) for country in self.countries_alpha3),
+                return_exceptions=True,
+            )
+            for res in results:
+                if isinstance(res, Exception):
+                    print(f"Got an exception: {res}")
         finally:
-            self.driver.quit()
+            await self._client.aclose()
+
+        # Merge the per-country checkpoints into one frame
+        country_files = sorted(glob.glob(os.path.join(self.countries_path, "*_tournaments.csv")))
+        frames = [pd.read_csv(f) for f in country_files]
+        merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        merged.to_csv(self.output_file, index=False)
+        return merged
 
-        return pd.DataFrame(all_tournaments)
 
+if __name__ == "__main__":
+    import uvloop
 
+    uvloop.install()
+    asyncio.run(ChessTournamentSeleniumScraper().crawl_all_tournaments())
@@ -2,26 +2,50 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+# Read a CSV with pyarrow's multi-threaded parser and Arrow-backed dtypes;
+# fall back to pandas' default engine where pyarrow is unavailable.
+def _read_csv_fast(source) -> pd.DataFrame:
+    try:
+        return pd.read_csv(source, engine="pyarrow", dtype_backend="pyarrow")
+    except (ImportError, ValueError):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pd.read_csv(source)
+
 # Cache data loading from an uploaded file.
 @st.cache_data
 def load_data(file) -> pd.DataFrame:
     try:
-        df = pd.read_csv(file)
+        df = _read_csv_fast(file)
         return df
     except Exception as e:
         st.error(f"Error loading CSV: {e}")
         return None
 
-# Cache data loading from a local file path.
+# Cache data loading from a local file path. Parquet files (the scrapers'
+# intermediate format) keep their dtypes and load much faster than CSV.
 @st.cache_data
 def load_data_from_path(path: str) -> pd.DataFrame:
     try:
-        df = pd.read_csv(path)
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        else:
+            df = _read_csv_fast(path)
         return df
     except Exception as e:
-        st.error(f"Error loading CSV from path '{path}': {e}")
+        st.error(f"Error loading data from path '{path}': {e}")
         return None
 
+# Cache the datetime coercion so chart interactions don't re-parse a
+# multi-million-row column on every Streamlit rerun. Aggregating to
+# (year, records) pairs here also means Altair only ships a handful of
+# rows to the browser instead of the whole dataset.
+@st.cache_data
+def prepare_timeline(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    dates = pd.to_datetime(df[col], errors="coerce")
+    years = pd.DataFrame({"year": dates.dt.year})
+    return years.groupby("year").size().reset_index(name="records")
+
 st.title("Chess Dataset Dashboard")
 
 # Sidebar: choose the data source.
@@ -66,11 +90,10 @@ if df is not None:
         st.subheader("Timeline Chart")
         date_choice = st.selectbox("Select a date column", date_cols)
         try:
-            df[date_choice] = pd.to_datetime(df[date_choice])
-            df['year'] = df[date_choice].dt.year
-            timeline_chart = alt.Chart(df).mark_bar().encode(
+            timeline_counts = prepare_timeline(df, date_choice)
+            timeline_chart = alt.Chart(timeline_counts).mark_bar().encode(
                 alt.X("year:O", title="Year"),
-                alt.Y("count()", title="Number of Records")
+                alt.Y("records:Q", title="Number of Records")
             ).properties(
                 width=700,
                 height=400,
@@ -1,16 +1,50 @@
 import re
+import concurrent.futures
+import dbm
+import hashlib
+import numpy as np
 import pandas as pd
 import glob
 import os
 
+# Compiled once; parse_round_cell can run millions of times per country file
+_ROUND_RE = re.compile(r"(\d+)([wb])([10½/+\-])?")
+
+# Matches per-round column names like "1.Rd", "2.Rd", ...
+_RD_COL_RE = re.compile(r"(\d+)\.Rd$")
+
+# Result decode as a tiny lookup table: result characters map to a small
+# integer code, and _RESULT_LUT[color, code] yields the score from White's
+# perspective. Indexing the table is a branchless array gather; code 3
+# marks unknown/forfeit characters, which keep their raw cell value.
+_RESULT_CODES = {"1": 0, "0": 1, "½": 2, "1/2": 2}
+_RESULT_LUT = np.array([
+    ["1-0", "0-1", "1/2-1/2", ""],  # color == 'w'
+    ["0-1", "1-0", "1/2-1/2", ""],  # color == 'b'
+], dtype=object)
+
+# Fixed column order of the games output files
+_COLS = (
+    "Round",
+    "WhiteStartNumber", "WhiteFed", "WhiteName", "WhiteRating",
+    "BlackStartNumber", "BlackFed", "BlackName", "BlackRating",
+    "Result", "tournament_url",
+)
+
 class ResultsConverter:
-    def __init__(self, results_folder="data/results", games_folder="data/games"):
+    def __init__(self, results_folder="data/results", games_folder="data/games", output_format="csv"):
         """
         :param results_folder: Path to folder containing CSV files like 'USA_results.csv'
         :param games_folder:   Path to folder where output (e.g. 'USA_games.csv') should be saved
+        :param output_format:  'csv' or 'parquet'. Parquet writes faster and
+                               compresses the repeated Fed/Name/Result strings
+                               far better than CSV.
         """
+        if output_format not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported output_format: {output_format}")
         self.results_folder = results_folder
         self.games_folder = games_folder
+        self.output_format = output_format
         os.makedirs(self.games_folder, exist_ok=True)  # Create output folder if not exists
 
     @staticmethod
@@ -18,157 +52,288 @@ class ResultsConverter:
         """
         Parse a cell like "16w1", "21b½", etc.
         Returns a tuple (opponent_number, color, result) or None if no match.
+        Scalar utility; convert_all_results parses whole columns vectorized.
         """
-        cell_value = str(cell_value).strip()
-        if not cell_value or cell_value.lower() == "nan":
+        # Empty cells dominate late rounds (drop-outs); bail out before any
+        # string work. `x != x` is the NaN test without a function call.
+        if cell_value is None or cell_value is pd.NA or (
+            isinstance(cell_value, float) and cell_value != cell_value
+        ):
             return None
-        
-        match = re.match(r"(\d+)([wb])([10½/\+\-])?", cell_value)
+        s = cell_value if isinstance(cell_value, str) else str(cell_value)
+
+        match = _ROUND_RE.match(s.strip())
         if not match:
             return None
-        
+
         opp_str, color, result = match.groups()
-        opp_num = int(opp_str)
-        return (opp_num, color, result)
+        return (int(opp_str), color, result)
 
     def convert_all_results(self):
         """
         Convert all '*_results.csv' files in 'self.results_folder' into
         corresponding '*_games.csv' in 'self.games_folder'.
         If the output file already exists, that country is skipped.
+
+        Countries are fully independent (own input file, own output file),
+        so they are converted in parallel, one worker process per file.
         """
         # Grab all CSVs in the results folder that match the pattern "<something>_results.csv"
         csv_files = glob.glob(os.path.join(self.results_folder, "*_results.csv"))
 
-        for file_path in csv_files:
-            country = os.path.basename(file_path).replace("_results.csv", "")
-            out_path = os.path.join(self.games_folder, f"{country}_games.csv")
-
-            # If we've already converted this country, skip it
-            if os.path.exists(out_path):
-                print(f"Skipping {country}, games file already exists.")
-                continue
-
-            print(f"Converting results for {country}...")
-
-            # Read the input file
-            df = pd.read_csv(file_path)
-
-            print(f"Loaded {len(df)} rows from {file_path}")
-
-            # check if has column Rg in df
-            if 'Rg' not in df.columns or 'Fed' not in df.columns:
-                print(f"Skipping {country}, no ratings found.")
-                continue
-
-            # Identify how many rounds there are by searching for columns like "1.Rd", "2.Rd", etc.
-            # This code assumes columns like "1.Rd", "2.Rd", ...
-            rounds_num = (
-                df.columns
-                  .str.extract(r"(\d+)\.Rd")
-                  .dropna()
-                  .astype(int)
-                  .max()
-                  .item()
-            )
-
-            all_games = []
-
-            for i, row in df.iterrows():
-                # Player "start number" is typically in column 'Nr' (change if needed)
-                player_id = row["Nr"]
-                player_name = row["Nazwisko"]
-                player_rating = row["Rg"]
-                player_fed = row["Fed"]
-
-                # For each round, parse the cell if it exists
-                for r in range(1, rounds_num + 1):
-                    col_name = f"{r}.Rd"
-                    if col_name not in df.columns:
-                        break  # or continue if columns may be missing sporadically
-
-                    cell_val = row[col_name]
-                    parsed = self.parse_round_cell(cell_val)
-                    if not parsed:
-                        continue
-
-                    opp_num, color, result = parsed
-
-                    # Only record game if opponent's start number is larger => avoid duplicates
-                    if opp_num <= player_id:
-                        continue
-
-                    # Prepare row data
-                    if color == 'w':
-                        # Current player is White
-                        white_id = player_id
-                        white_name = player_name
-                        white_rating = player_rating
-                        white_fed = player_fed
-
-                        # Opponent is Black
-                        opp_row = df.loc[opp_num - 1]
-                        black_id = opp_num
-                        black_name = opp_row["Nazwisko"]
-                        black_rating = opp_row["Rg"]
-                        black_fed = opp_row["Fed"]
-
-                        # Result string from White's perspective
-                        if result == '1':
-                            final_result = "1-0"
-                        elif result == '0':
-                            final_result = "0-1"
-                        elif result in ['½', '1/2']:
-                            final_result = "1/2-1/2"
-                        else:
-                            final_result = f"{result}"
-                    else:
-                        # Current player is Black
-                        black_id = player_id
-                        black_name = player_name
-                        black_rating = player_rating
-                        black_fed = player_fed
-
-                        # Opponent is White
-                        opp_row = df.loc[opp_num - 1]
-                        white_id = opp_num
-                        white_name = opp_row["Nazwisko"]
-                        white_rating = opp_row["Rg"]
-                        white_fed = opp_row["Fed"]
-
-                        # Result string given is from Black's perspective
-                        if result == '1':
-                            # Black won => from White's perspective it's 0-1
-                            final_result = "0-1"
-                        elif result == '0':
-                            # Black lost => from White's perspective it's 1-0
-                            final_result = "1-0"
-                        elif result in ['½', '1/2']:
-                            final_result = "1/2-1/2"
-                        else:
-                            final_result = f"{result}"
-
-                    # Append to list of all games
-                    all_games.append({
-                        "Round": r,
-                        "WhiteStartNumber": white_id,
-                        "WhiteFed": white_fed,
-                        "WhiteName": white_name,
-                        "WhiteRating": white_rating,
-                        "BlackStartNumber": black_id,
-                        "BlackFed": black_fed,
-                        "BlackName": black_name,
-                        "BlackRating": black_rating,
-                        "Result": final_result,
-                        "tournament_url": row.get("tournament_url", "")  # handle missing columns safely
-                    })
-
-            # Create a DataFrame of all games and save
-            games_df = pd.DataFrame(all_games)
-            if not games_df.empty:
-                # Sort if desired
-                games_df.sort_values(by=["Round", "WhiteName"], inplace=True)
-
-            # Write to CSV
+        # Input-change cache: each entry records "mtime_ns:size/sha256" for
+        # a converted input. Reruns cost one stat per file — only when the
+        # stat signature changed is the file hashed, and only when the
+        # content really changed is the country reconverted (overwriting
+        # its stale output). The dbm is only ever opened here in the
+        # parent, keeping it single-writer.
+        written = []
+        with dbm.open(os.path.join(self.games_folder, ".digests.dbm"), "c") as db:
+            pending = []
+            overwrite_flags = []
+            pending_entries = []
+            for file_path in csv_files:
+                key = file_path.encode()
+                country = os.path.basename(file_path).replace("_results.csv", "")
+                out_exists = any(
+                    os.path.exists(os.path.join(self.games_folder, f"{country}_games.{ext}"))
+                    for ext in ("csv", "parquet")
+                )
+                st = os.stat(file_path)
+                stat_sig = f"{st.st_mtime_ns}:{st.st_size}"
+
+                if not out_exists:
+                    # Never converted (or output was deleted): convert.
+                    pending.append(file_path)
+                    overwrite_flags.append(False)
+                    pending_entries.append(f"{stat_sig}/{self._file_digest(file_path)}")
+                    continue
+
+                recorded = db.get(key)
+                if recorded is None:
+                    # Output predates the cache; adopt it as current.
+                    db[key] = f"{stat_sig}/{self._file_digest(file_path)}".encode()
+                    print(f"Skipping {country}, games file already exists.")
+                    continue
+
+                rec_stat, _, rec_hash = recorded.decode().partition("/")
+                if rec_stat == stat_sig:
+                    print(f"Skipping {country}, input unchanged.")
+                    continue
+
+                digest = self._file_digest(file_path)
+                if digest == rec_hash:
+                    # Touched but identical: refresh the stat signature so
+                    # the next run skips on the stat alone.
+                    db[key] = f"{stat_sig}/{digest}".encode()
+                    print(f"Skipping {country}, input unchanged.")
+                    continue
+
+                # Content changed: reconvert over the stale output.
+                pending.append(file_path)
+                overwrite_flags.append(True)
+                pending_entries.append(f"{stat_sig}/{digest}")
+
+            with concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+                results = list(ex.map(self._convert_one, pending, overwrite_flags))
+
+            # Record an entry only for conversions that actually produced
+            # output; a failed or skipped file stays stale in the cache.
+            for file_path, entry, out_path in zip(pending, pending_entries, results):
+                if out_path:
+                    db[file_path] = entry.encode()
+                    written.append(out_path)
+        return written
+
+    @staticmethod
+    def _file_digest(file_path):
+        """sha256 hex digest of a file's bytes; the slow half of the cache key."""
+        with open(file_path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    def _convert_one(self, file_path, overwrite=False):
+        """
+        Convert a single country's results file. Returns the output path,
+        or None if the country was skipped. The skip check lives here, in
+        the worker, so racing invocations don't double-convert a country;
+        `overwrite` disables it when the input is known to have changed
+        and the existing output is stale.
+        """
+        country = os.path.basename(file_path).replace("_results.csv", "")
+        out_path = os.path.join(self.games_folder, f"{country}_games.{self.output_format}")
+
+        # If we've already converted this country (in either format), skip it
+        if not overwrite and any(
+            os.path.exists(os.path.join(self.games_folder, f"{country}_games.{ext}"))
+            for ext in ("csv", "parquet")
+        ):
+            print(f"Skipping {country}, games file already exists.")
+            return None
+
+        print(f"Converting results for {country}...")
+
+        # Peek at the header only, so files without ratings are skipped
+        # before parsing anything and the real read can be restricted to
+        # the columns the conversion actually uses.
+        header = pd.read_csv(file_path, nrows=0)
+        if 'Rg' not in header.columns or 'Fed' not in header.columns:
+            print(f"Skipping {country}, no ratings found.")
+            return None
+
+        keep = {"Nr", "Nazwisko", "Rg", "Fed", "tournament_url"}
+        keep.update(c for c in header.columns if c.endswith(".Rd"))
+
+        df = pd.read_csv(
+            file_path,
+            usecols=lambda c: c in keep,
+            dtype={
+                "Nr": "Int32",
+                "Rg": "Int32",
+                "Nazwisko": "string",
+                # Federation codes repeat heavily; category stores each
+                # distinct code once and 1-2 bytes per row.
+                "Fed": "category",
+                "tournament_url": "string",
+                **{c: "string" for c in keep if c.endswith(".Rd")},
+            },
+        )
+
+        print(f"Loaded {len(df)} rows from {file_path}")
+
+        # Nr is read as nullable Int32 so one blank/malformed start number
+        # doesn't abort the whole country; such rows are unpairable anyway,
+        # so drop them and work on plain int32 from here on.
+        if df["Nr"].isna().any():
+            df = df.dropna(subset=["Nr"])
+        df["Nr"] = df["Nr"].astype("int32")
+
+        # Identify how many rounds there are from columns like "1.Rd", "2.Rd".
+        # A plain scan over the handful of column names beats the old
+        # .str.extract().dropna().astype().max() chain, which built a
+        # throwaway pandas object per step just to find one integer.
+        rounds_num = max(
+            (int(m.group(1)) for c in df.columns if (m := _RD_COL_RE.match(c))),
+            default=0,
+        )
+
+        # handle missing columns safely
+        if "tournament_url" not in df.columns:
+            df["tournament_url"] = ""
+
+        # Melt the per-round columns to long form: one row per
+        # (player, round) pairing cell. The column-name -> round-number
+        # map is built once up front, so recovering the round after the
+        # melt is a small dict lookup instead of a regex over every row.
+        id_vars = ["Nr", "Nazwisko", "Rg", "Fed", "tournament_url"]
+        round_cols = {f"{r}.Rd": r for r in range(1, rounds_num + 1) if f"{r}.Rd" in df.columns}
+        long = df[id_vars + list(round_cols)].melt(
+            id_vars=id_vars,
+            value_vars=list(round_cols),
+            var_name="Round",
+            value_name="cell",
+        )
+        long["Round"] = long["Round"].map(round_cols).astype(int)
+
+        # Parse every cell like "16w1" / "21b½" in one vectorized pass
+        parsed = long["cell"].astype("string").str.extract(r"^(\d+)([wb])([10½/+\-])?")
+        long["opp_num"] = parsed[0]
+        long["color"] = parsed[1]
+        long["result"] = parsed[2]
+
+        # Drop byes/empty cells, then keep each game once: only the row
+        # where the opponent's start number is larger survives. Masking
+        # before the merge halves the join's input, and comparing raw
+        # arrays avoids an intermediate index-aligned Series.
+        long = long.dropna(subset=["opp_num"])
+        long["opp_num"] = long["opp_num"].astype(int)
+        long = long.loc[long["opp_num"].to_numpy() > long["Nr"].to_numpy()]
+
+        # Vectorized opponent join. The key includes tournament_url
+        # because start numbers restart at 1 in every tournament; the
+        # old row-positional lookup mixed opponents up across
+        # tournaments within a country file.
+        opp = df[["tournament_url", "Nr", "Nazwisko", "Rg", "Fed"]].rename(columns={
+            "Nr": "opp_num",
+            "Nazwisko": "OppName",
+            "Rg": "OppRating",
+            "Fed": "OppFed",
+        })
+        long = long.merge(opp, on=["tournament_url", "opp_num"], how="inner")
+        del df, opp  # only the merged frame is needed from here on
+
+        # Split player/opponent into White/Black based on the cell color.
+        # Work on plain NumPy arrays: each column is pulled out once and
+        # np.where never touches pandas' label-alignment machinery.
+        is_white = long["color"].to_numpy() == "w"
+        nr_arr = long["Nr"].to_numpy()
+        name_arr = long["Nazwisko"].to_numpy()
+        rating_arr = long["Rg"].to_numpy()
+        opp_nr_arr = long["opp_num"].to_numpy()
+        opp_name_arr = long["OppName"].to_numpy()
+        opp_rating_arr = long["OppRating"].to_numpy()
+        # Fed stays categorical end to end: both sides share df["Fed"]'s
+        # dictionary, so the White/Black split can select between integer
+        # code arrays and rebuild categoricals without materializing the
+        # federation strings per row.
+        fed_dtype = long["Fed"].dtype
+        fed_codes = long["Fed"].cat.codes.to_numpy()
+        opp_fed_codes = long["OppFed"].astype(fed_dtype).cat.codes.to_numpy()
+        round_arr = long["Round"].to_numpy()
+        turl_arr = long["tournament_url"].to_numpy()
+        result_raw = long["result"].fillna("").to_numpy()
+        # The long frame has served its purpose; free it before building
+        # the output frame so only one full-size copy is resident at peak.
+        del long
+
+        white_id = np.where(is_white, nr_arr, opp_nr_arr)
+        white_name = np.where(is_white, name_arr, opp_name_arr)
+        white_rating = np.where(is_white, rating_arr, opp_rating_arr)
+        white_fed = pd.Categorical.from_codes(
+            np.where(is_white, fed_codes, opp_fed_codes), dtype=fed_dtype
+        )
+        black_id = np.where(is_white, opp_nr_arr, nr_arr)
+        black_name = np.where(is_white, opp_name_arr, name_arr)
+        black_rating = np.where(is_white, opp_rating_arr, rating_arr)
+        black_fed = pd.Categorical.from_codes(
+            np.where(is_white, opp_fed_codes, fed_codes), dtype=fed_dtype
+        )
+
+        # Decode results through _RESULT_LUT: encode the result character
+        # as a small integer, then gather _RESULT_LUT[color, code] in one
+        # shot. Unknown/forfeit codes (3) fall back to the raw cell value.
+        result_codes = np.full(len(result_raw), 3, dtype=np.intp)
+        for char, code in _RESULT_CODES.items():
+            result_codes[result_raw == char] = code
+        final_result = _RESULT_LUT[(~is_white).astype(np.intp), result_codes]
+        unknown = result_codes == 3
+        if unknown.any():
+            final_result[unknown] = result_raw[unknown]
+
+        # One column array per _COLS entry, in schema order
+        games_df = pd.DataFrame(dict(zip(_COLS, (
+            round_arr,
+            white_id, white_fed, white_name, white_rating,
+            black_id, black_fed, black_name, black_rating,
+            final_result,
+            turl_arr,
+        ))))
+        if not games_df.empty:
+            # Sort on integer keys: categorical codes order the same way as
+            # the names (categories are lexicographically sorted), so the
+            # sort never falls back to per-row Python string comparisons.
+            # mergesort is stable, keeping same-key games in parsed order.
+            games_df["_wn_code"] = games_df["WhiteName"].astype("category").cat.codes
+            games_df.sort_values(by=["Round", "_wn_code"], kind="mergesort", inplace=True)
+            games_df.drop(columns="_wn_code", inplace=True)
+
+        # Write in the configured format
+        if self.output_format == "parquet":
+            games_df.to_parquet(out_path, compression="zstd", index=False)
+        else:
             games_df.to_csv(out_path, index=False)
-            print(f"Saved {len(games_df)} games to {out_path}")
+        print(f"Saved {len(games_df)} games to {out_path}")
+        return out_path
+
+
+if __name__ == "__main__":
+    ResultsConverter().convert_all_results()